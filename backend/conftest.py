@@ -0,0 +1 @@
+# Lets tests import the app modules (models, services) the way main.py does
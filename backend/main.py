@@ -1,15 +1,17 @@
-python name=backend/main.py
 from pathlib import Path
 from typing import List
 
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 
-from models.dish import Dish, DishDetailOut, PreferenceIn, RecommendationOut
-from services.matcher import match_dishes
+from models.dish import Dish, DishRec, PreferenceBatchIn, PreferenceIn, RecommendationOut
+from services.matcher import (
+    build_index, match_dishes, match_dishes_batch, match_dishes_cached, normalize_dish, set_catalog,
+)
 
-import json
 import logging
+import orjson
 
 # Basic logging
 logging.basicConfig(level=logging.INFO)
@@ -19,6 +21,7 @@ app = FastAPI(
     title="Ilocano Food Match AI - Backend",
     description="API to match Ilocano dishes to user preferences",
     version="1.0.0",
+    default_response_class=ORJSONResponse,
 )
 
 # Enable CORS for all origins (frontend is separate)
@@ -37,44 +40,63 @@ DATA_PATH = Path(__file__).resolve().parent / "data" / "dishes.json"
 @app.on_event("startup")
 def load_data():
     """
-    Load dishes.json into memory on startup and validate against Pydantic model.
+    Load dishes.json into memory on startup.
     """
     logger.info("Loading dishes from %s", DATA_PATH)
     try:
-        with open(DATA_PATH, "r", encoding="utf-8") as f:
-            raw = json.load(f)
-        # Validate and coerce into Dish objects
-        dishes: List[Dish] = [Dish(**d) for d in raw]
-        # Store in app state
-        app.state.dishes = dishes
+        raw = orjson.loads(DATA_PATH.read_bytes())
+        # dishes.json is authored in this repo and trusted, so build Dish objects
+        # without running validation on every record (defaults still apply)
+        dishes: List[Dish] = [Dish.construct(**d) for d in raw]
+        # Store in app state; the Dish objects are dropped once these are built
+        # Plain dicts served by /dishes and /dish/{id}
+        app.state.dishes_public = [d.dict() for d in dishes]
+        # Frozen, slotted copies read by the matcher
+        app.state.dishes_internal = [DishRec.from_dish(d) for d in dishes]
+        # id -> dish dict for /dish/{id}; reversed so the first dish wins on duplicate ids
+        app.state.dish_by_id = {d["id"]: d for d in reversed(app.state.dishes_public)}
+        # Comparable fields normalized once up front
+        internal = app.state.dishes_internal
+        normalized = [normalize_dish(d) for d in internal]
+        # Token -> dish postings, so scoring only visits dishes a preference hits
+        index = build_index(internal, normalized)
+        # Ranking for an empty preference set never changes, so compute it once
+        defaults = match_dishes(internal, normalized, index, PreferenceIn(), top_n=len(internal))
+        # /match and /match_batch score against the catalog installed here
+        set_catalog(internal, normalized, index, defaults)
         logger.info("Loaded %d dishes", len(dishes))
     except Exception as ex:
         logger.exception("Failed to load dishes.json: %s", ex)
-        # If load fails, ensure app.state.dishes exists as empty list
-        app.state.dishes = []
+        # If load fails, ensure the dish state exists as empty collections
+        app.state.dishes_public = []
+        app.state.dishes_internal = []
+        app.state.dish_by_id = {}
+        set_catalog([], [], build_index([], []), [])
 
 
-@app.get("/dishes", response_model=List[Dish])
-def get_all_dishes():
+@app.get("/dishes", response_model=None)
+async def get_all_dishes():
     """
     Return the list of all dishes (admin/test use).
+    Served from dicts dumped at startup, skipping per-request re-validation.
     """
-    return app.state.dishes
+    return app.state.dishes_public
 
 
-@app.get("/dish/{dish_id}", response_model=Dish)
-def get_dish(dish_id: int):
+@app.get("/dish/{dish_id}", response_model=None)
+async def get_dish(dish_id: int):
     """
     Return full details for one dish by id.
+    Served from the dicts dumped at startup, like /dishes.
     """
-    for d in app.state.dishes:
-        if d.id == dish_id:
-            return d
-    raise HTTPException(status_code=404, detail="Dish not found")
+    d = app.state.dish_by_id.get(dish_id)
+    if d is None:
+        raise HTTPException(status_code=404, detail="Dish not found")
+    return d
 
 
 @app.post("/match", response_model=dict)
-def match_endpoint(preference: PreferenceIn):
+async def match_endpoint(preference: PreferenceIn):
     """
     Receive user preferences and return top 3 recommendations.
     Response format:
@@ -85,17 +107,42 @@ def match_endpoint(preference: PreferenceIn):
       ]
     }
     """
-    dishes: List[Dish] = app.state.dishes
-    if not dishes:
+    if not app.state.dishes_internal:
         raise HTTPException(status_code=500, detail="Dish dataset not loaded")
 
-    recommendations: List[RecommendationOut] = match_dishes(dishes, preference)
+    # Scored against the dataset registered with set_catalog() in load_data().
+    # Matching is a short, non-blocking CPU step (bitset ops plus an LRU
+    # cache), so it runs on the event loop instead of a threadpool hop.
+    recommendations: List[RecommendationOut] = match_dishes_cached(preference)
+
+    return {"recommendations": _format_recommendations(recommendations)}
 
-    # Format into the required response (name, image, reason)
-    resp = {
-        "recommendations": [
-            {"name": r.name, "image": r.image, "reason": r.reason, "score": r.score}
-            for r in recommendations
-        ]
+
+@app.post("/match_batch", response_model=dict)
+async def match_batch_endpoint(body: PreferenceBatchIn):
+    """
+    Receive several preference sets and return top 3 recommendations for each,
+    in the same order, saving one round-trip per preference set.
+    Response format:
+    {
+      "results": [
+        { "recommendations": [ { "name": "...", "image": "...", "reason": "..." }, ... ] },
+        ...
+      ]
     }
-    return resp
+    """
+    if not app.state.dishes_internal:
+        raise HTTPException(status_code=500, detail="Dish dataset not loaded")
+
+    batches: List[List[RecommendationOut]] = match_dishes_batch(body.preferences)
+    return {"results": [{"recommendations": _format_recommendations(recs)} for recs in batches]}
+
+
+def _format_recommendations(recommendations: List[RecommendationOut]) -> List[dict]:
+    """
+    Format recommendations into the response entries (name, image, reason).
+    """
+    return [
+        {"name": r.name, "image": r.image, "reason": r.reason, "score": r.score}
+        for r in recommendations
+    ]
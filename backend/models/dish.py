@@ -1,6 +1,6 @@
-python name=backend/models/dish.py
-from typing import List, Optional
-from pydantic import BaseModel, Field
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+from pydantic import BaseModel, Field, conlist
 
 
 class Dish(BaseModel):
@@ -18,6 +18,37 @@ class Dish(BaseModel):
     occasions: List[str] = Field(default_factory=list)  # e.g., ["everyday", "celebration", "merienda"]
 
 
+@dataclass(frozen=True, slots=True)
+class DishRec:
+    """
+    Read-only, slotted copy of a Dish used internally for matching; no
+    per-instance __dict__ and plain attribute reads.
+    """
+    id: int
+    name: str
+    description: Optional[str]
+    ingredients: Tuple[str, ...]
+    taste: str
+    cooking_method: str
+    dietary_tags: Tuple[str, ...]
+    image: Optional[str]
+    occasions: Tuple[str, ...]
+
+    @classmethod
+    def from_dish(cls, dish: Dish) -> "DishRec":
+        return cls(
+            id=dish.id,
+            name=dish.name,
+            description=dish.description,
+            ingredients=tuple(dish.ingredients),
+            taste=dish.taste,
+            cooking_method=dish.cooking_method,
+            dietary_tags=tuple(dish.dietary_tags),
+            image=dish.image,
+            occasions=tuple(dish.occasions or ()),
+        )
+
+
 class PreferenceIn(BaseModel):
     """
     Input model for /match endpoint.
@@ -29,6 +60,18 @@ class PreferenceIn(BaseModel):
     occasion: Optional[str] = None
 
 
+# Upper bound on preference sets per /match_batch request; the batch is scored
+# on the event loop, so this bounds how long one request can hold it
+MAX_BATCH_SIZE = 100
+
+
+class PreferenceBatchIn(BaseModel):
+    """
+    Input model for /match_batch endpoint: several preference sets in one request.
+    """
+    preferences: conlist(PreferenceIn, min_items=1, max_items=MAX_BATCH_SIZE)
+
+
 class RecommendationOut(BaseModel):
     """
     Model for recommendation result.
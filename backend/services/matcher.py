@@ -1,20 +1,31 @@
-python name=backend/services/matcher.py
-from typing import List
+from collections import defaultdict, namedtuple
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, List, Optional, Tuple
+import functools
+import heapq
 import re
+import sys
 import logging
 
-from models.dish import Dish, PreferenceIn, RecommendationOut
+from models.dish import DishRec, PreferenceIn, RecommendationOut
 
 logger = logging.getLogger("matcher")
 
+# Compiled once at import; these run for every token normalized
+_NORMALIZE_RE = re.compile(r"[^a-z0-9]+")
+_LEADING_NO_RE = re.compile(r"^no\s+")
 
+
+@functools.lru_cache(maxsize=1024)
 def normalize_token(s: str) -> str:
     """
     Helper to normalize strings for comparison.
+    Memoized: request tokens come from a small, repeating vocabulary.
     """
-    return re.sub(r"[^a-z0-9]+", " ", (s or "").lower()).strip()
+    return _NORMALIZE_RE.sub(" ", (s or "").lower()).strip()
 
 
+@functools.lru_cache(maxsize=1024)
 def parse_restriction_token(restr: str) -> str:
     """
     Convert dietary restriction text into a canonical token to match against dish tags or ingredients.
@@ -28,14 +39,305 @@ def parse_restriction_token(restr: str) -> str:
     s = s.replace("_", " ").replace("-", " ")
     s = s.strip()
     # Remove leading "no " or "no-" if present
-    s = re.sub(r"^no\s+", "", s)
+    s = _LEADING_NO_RE.sub("", s)
     s = s.strip()
     # normalize non-alnum
     s = normalize_token(s)
     return s
 
 
-def match_dishes(dishes: List[Dish], prefs: PreferenceIn, top_n: int = 3) -> List[RecommendationOut]:
+def _interned_token(s: str) -> str:
+    """
+    normalize_token, interned so repeated tokens share one string object and
+    equality/hash checks can short-circuit on identity.
+    """
+    return sys.intern(normalize_token(s))
+
+
+@dataclass(frozen=True, slots=True)
+class NormalizedDish:
+    """
+    Comparable dish fields, normalized once when the dataset is loaded.
+    """
+    taste: str
+    cooking: str
+    ingredients: FrozenSet[str]
+    tags: FrozenSet[str]
+    occasions: FrozenSet[str]
+
+
+def normalize_dish(dish: DishRec) -> NormalizedDish:
+    """
+    Precompute the normalized tokens match_dishes compares against.
+    """
+    return NormalizedDish(
+        taste=_interned_token(dish.taste),
+        cooking=_interned_token(dish.cooking_method),
+        ingredients=frozenset(_interned_token(i) for i in dish.ingredients),
+        tags=frozenset(_interned_token(t) for t in dish.dietary_tags),
+        occasions=frozenset(_interned_token(o) for o in dish.occasions),
+    )
+
+
+@dataclass(frozen=True)
+class DishIndex:
+    """
+    Inverted indexes from normalized token to the dishes that have it, built
+    once when the dataset is loaded. Each posting is a bitset over dish
+    positions stored in a Python int (bit i set = dishes[i] has the token), so
+    preferences combine with whole-column AND/OR instead of per-dish lookups.
+    """
+    taste: Dict[str, int]
+    cooking: Dict[str, int]
+    ingredient: Dict[str, int]
+    tag: Dict[str, int]
+    occasion: Dict[str, int]
+    # Every dish position, as a bitset
+    all_dishes: int
+    # All positions in the order dishes rank when they score the same (name desc)
+    rank_order: Tuple[int, ...]
+    # rank[idx] is the position of dish idx in rank_order
+    rank: Tuple[int, ...]
+
+
+def build_index(dishes: List[DishRec], normalized_dishes: List[NormalizedDish]) -> DishIndex:
+    """
+    Index normalized dish fields so scoring only visits dishes a preference touches.
+    """
+    postings: Dict[str, Dict[str, int]] = {
+        "taste": defaultdict(int),
+        "cooking": defaultdict(int),
+        "ingredient": defaultdict(int),
+        "tag": defaultdict(int),
+        "occasion": defaultdict(int),
+    }
+    for idx, normalized in enumerate(normalized_dishes):
+        bit = 1 << idx
+        postings["taste"][normalized.taste] |= bit
+        postings["cooking"][normalized.cooking] |= bit
+        for i in normalized.ingredients:
+            postings["ingredient"][i] |= bit
+        for t in normalized.tags:
+            postings["tag"][t] |= bit
+        for o in normalized.occasions:
+            postings["occasion"][o] |= bit
+
+    # Plain dicts, so lookups for unknown tokens cannot grow the index
+    frozen = {field: dict(by_token) for field, by_token in postings.items()}
+    # sorted() is stable, so equal names keep dataset order like the full sort did
+    rank_order = tuple(sorted(range(len(dishes)), key=lambda idx: dishes[idx].name, reverse=True))
+    rank = [0] * len(dishes)
+    for position, idx in enumerate(rank_order):
+        rank[idx] = position
+    return DishIndex(all_dishes=(1 << len(dishes)) - 1, rank_order=rank_order, rank=tuple(rank),
+                     **frozen)
+
+
+def _first_in_rank_order(index: DishIndex, members: int, needed: int) -> List[int]:
+    """
+    Return up to `needed` dish positions from the bitset `members`, best ranked first.
+    """
+    # flags[idx] == "1" when dish idx is a member
+    flags = bin(members)[:1:-1]
+    count = flags.count("1")
+    # Ranking the members directly costs about `count` steps (find each one,
+    # then nsmallest). Walking rank_order until `needed` members turn up costs
+    # about needed * len(rank) / count steps when members are spread evenly.
+    # Rank directly when that is the cheaper of the two.
+    if count * count <= needed * len(index.rank):
+        # Few members: pull them out of the bitset and rank them directly
+        positions = []
+        idx = flags.find("1")
+        while idx != -1:
+            positions.append(idx)
+            idx = flags.find("1", idx + 1)
+        return heapq.nsmallest(needed, positions, key=index.rank.__getitem__)
+
+    # Many members: walk the global order until enough are found
+    found: List[int] = []
+    size = len(flags)
+    for idx in index.rank_order:
+        if idx < size and flags[idx] == "1":
+            found.append(idx)
+            if len(found) == needed:
+                break
+    return found
+
+
+# Normalized preferences: (taste, ingredients, restrictions, cooking, occasion,
+# occasion as typed for the reason text, top_n)
+PreferenceKey = Tuple[str, Tuple[str, ...], Tuple[str, ...], str, str, str, int]
+
+# Dataset scored by match_dishes_cached; installed by set_catalog() at startup
+_catalog_dishes: List[DishRec] = []
+_catalog_normalized: List[NormalizedDish] = []
+_catalog_index: DishIndex = build_index([], [])
+_catalog_defaults: List[RecommendationOut] = []
+
+
+def preference_key(prefs: PreferenceIn, top_n: int = 3) -> PreferenceKey:
+    """
+    Normalize preferences into a hashable key; list order does not matter.
+    """
+    pref_taste = _interned_token(prefs.preferred_taste or "")
+    # Empty tokens are dropped, as for restrictions below
+    ingredients = (_interned_token(i) for i in prefs.ingredients_preference or [])
+    pref_ingredients = tuple(sorted({tok for tok in ingredients if tok}))
+    pref_cooking = _interned_token(prefs.cooking_method or "")
+    pref_occasion = _interned_token(prefs.occasion or "")
+
+    # Empty tokens never match anything; drop them here rather than in the scoring loops
+    parsed = (parse_restriction_token(r) for r in (prefs.dietary_restrictions or []) if r)
+    restriction_tokens = tuple(sorted(sys.intern(rt) for rt in parsed if rt))
+
+    return (pref_taste, pref_ingredients, restriction_tokens, pref_cooking, pref_occasion,
+            prefs.occasion or "", top_n)
+
+
+# What matched for one scored dish; rendered to text only for the top_n survivors
+ScoreRecord = namedtuple(
+    "ScoreRecord", "score dish taste_match ing_hits restriction_hits cooking_match occasion_match")
+
+
+def _score_record(score: int, dish: DishRec, normalized: NormalizedDish, pref_key: PreferenceKey) -> ScoreRecord:
+    """
+    Collect match flags for a scored dish (no string building). Checks for
+    preference fields that are empty are skipped rather than evaluated.
+    """
+    pref_taste, pref_ingredients, restriction_tokens, pref_cooking, pref_occasion, _, _ = pref_key
+    ingredients = normalized.ingredients
+    return ScoreRecord(
+        score=score,
+        dish=dish,
+        taste_match=pref_taste == normalized.taste if pref_taste else False,
+        ing_hits=tuple(sorted(ingredients.intersection(pref_ingredients))) if pref_ingredients else (),
+        restriction_hits=tuple(rt for rt in restriction_tokens
+                               if rt in ingredients or rt in normalized.tags) if restriction_tokens else (),
+        cooking_match=pref_cooking == normalized.cooking if pref_cooking else False,
+        occasion_match=pref_occasion in normalized.occasions if pref_occasion else False,
+    )
+
+
+def _format_reason(rec: ScoreRecord, occasion_label: str) -> str:
+    """
+    Build the reason text shown for a recommendation.
+    """
+    reasons = []
+    if rec.taste_match:
+        reasons.append(f"Matches taste: {rec.dish.taste} (+3)")
+    if rec.ing_hits:
+        reasons.append(f"Contains preferred ingredient(s): {', '.join(rec.ing_hits)} (+3)")
+    for rt in rec.restriction_hits:
+        reasons.append(f"Contains restricted item: {rt} (-5)")
+    if rec.cooking_match:
+        reasons.append(f"Cooking method matches: {rec.dish.cooking_method} (+2)")
+    if rec.occasion_match:
+        reasons.append(f"Suitable for: {occasion_label} (+1)")
+
+    # Fallback small reason if nothing matched positively
+    if not reasons:
+        reasons.append("No strong positive matches; showing as lower-scoring suggestion")
+
+    return "; ".join(reasons)
+
+
+def _score_dishes(dishes: List[DishRec], normalized_dishes: List[NormalizedDish], index: DishIndex,
+                  pref_key: PreferenceKey,
+                  default_recommendations: Optional[List[RecommendationOut]]) -> List[RecommendationOut]:
+    """
+    Score dishes against already-normalized preferences (see match_dishes).
+    """
+    pref_taste, pref_ingredients, restriction_tokens, pref_cooking, pref_occasion, occasion_label, top_n = pref_key
+
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Preferences normalized: taste=%s, ingredients=%s, cooking=%s, occasion=%s, restrictions=%s",
+                     pref_taste, pref_ingredients, pref_cooking, pref_occasion, restriction_tokens)
+
+    # Which scoring blocks can contribute at all; decided once per request
+    do_taste = bool(pref_taste)
+    do_ing = bool(pref_ingredients)
+    do_restrict = bool(restriction_tokens)
+    do_cook = bool(pref_cooking)
+    do_occ = bool(pref_occasion)
+
+    # Nothing to score on: every dish gets 0, so the ranking is known up front
+    if default_recommendations is not None and not (
+            do_taste or do_ing or do_cook or do_occ or do_restrict):
+        return default_recommendations[:top_n]
+
+    # Each preference selects the dishes it hits as a bitset over dish
+    # positions (see DishIndex), paired with the score delta it applies
+    ingredient_postings = index.ingredient.get
+    deltas: List[Tuple[int, int]] = []
+
+    # Taste match
+    if do_taste:
+        deltas.append((3, index.taste.get(pref_taste, 0)))
+
+    # Ingredient preference match (any)
+    if do_ing:
+        ingredient_bits = 0
+        for i in pref_ingredients:
+            ingredient_bits |= ingredient_postings(i, 0)
+        deltas.append((3, ingredient_bits))
+
+    # Dietary restrictions: penalize strongly if dish contains restricted ingredient or tag
+    if do_restrict:
+        tag_postings = index.tag.get
+        for rt in restriction_tokens:
+            deltas.append((-5, ingredient_postings(rt, 0) | tag_postings(rt, 0)))
+
+    # Cooking method match
+    if do_cook:
+        deltas.append((2, index.cooking.get(pref_cooking, 0)))
+
+    # Occasion fit
+    if do_occ:
+        deltas.append((1, index.occasion.get(pref_occasion, 0)))
+
+    # Split the catalog into score levels, one bitset per distinct score, by
+    # applying each delta to whole columns at once. Dishes no preference
+    # touches stay in level 0.
+    levels: Dict[int, int] = {0: index.all_dishes} if index.all_dishes else {}
+    for delta, bits in deltas:
+        if not bits:
+            continue
+        shifted: Dict[int, int] = defaultdict(int)
+        for score, members in levels.items():
+            hit = members & bits
+            if hit:
+                shifted[score + delta] |= hit
+            miss = members & ~bits
+            if miss:
+                shifted[score] |= miss
+        levels = shifted
+
+    # Top_n by score desc, then by name, then dataset order (stable deterministic)
+    top_scored: List[Tuple[int, int]] = []
+    for score in sorted(levels, reverse=True):
+        needed = top_n - len(top_scored)
+        if needed <= 0:
+            break
+        top_scored.extend((idx, score) for idx in _first_in_rank_order(index, levels[score], needed))
+
+    top_results: List[RecommendationOut] = []
+    for idx, score in top_scored:
+        rec = _score_record(score, dishes[idx], normalized_dishes[idx], pref_key)
+        top_results.append(RecommendationOut(
+            id=rec.dish.id,
+            name=rec.dish.name,
+            image=rec.dish.image,
+            reason=_format_reason(rec, occasion_label),
+            score=score
+        ))
+
+    logger.debug("Top %d recommendations computed", len(top_results))
+    return top_results
+
+
+def match_dishes(dishes: List[DishRec], normalized_dishes: List[NormalizedDish], index: DishIndex,
+                 prefs: PreferenceIn, top_n: int = 3,
+                 default_recommendations: Optional[List[RecommendationOut]] = None) -> List[RecommendationOut]:
     """
     Core matching algorithm:
       +3 points for taste match
@@ -44,86 +346,57 @@ def match_dishes(dishes: List[Dish], prefs: PreferenceIn, top_n: int = 3) -> Lis
       +2 points for cooking method match
       +1 point if dish fits the occasion
 
+    normalized_dishes must be parallel to dishes (see normalize_dish) and index
+    built from them (see build_index).
+    default_recommendations, if given, is the precomputed full ranking for empty
+    preferences and is returned directly when no preference is set.
+
     Returns a list of RecommendationOut sorted by score desc (top_n).
     """
+    return _score_dishes(dishes, normalized_dishes, index, preference_key(prefs, top_n), default_recommendations)
 
-    # Normalize preferences
-    pref_taste = normalize_token(prefs.preferred_taste or "")
-    pref_ingredients = [normalize_token(i) for i in prefs.ingredients_preference or []]
-    pref_cooking = normalize_token(prefs.cooking_method or "")
-    pref_occasion = normalize_token(prefs.occasion or "")
-
-    restriction_tokens = [parse_restriction_token(r) for r in (prefs.dietary_restrictions or []) if r]
 
-    logger.debug("Preferences normalized: taste=%s, ingredients=%s, cooking=%s, occasion=%s, restrictions=%s",
-                 pref_taste, pref_ingredients, pref_cooking, pref_occasion, restriction_tokens)
+def set_catalog(dishes: List[DishRec], normalized_dishes: List[NormalizedDish], index: DishIndex,
+                default_recommendations: List[RecommendationOut]) -> None:
+    """
+    Install the dataset used by match_dishes_cached and drop cached results.
+    """
+    global _catalog_dishes, _catalog_normalized, _catalog_index, _catalog_defaults
+    _catalog_dishes = dishes
+    _catalog_normalized = normalized_dishes
+    _catalog_index = index
+    _catalog_defaults = default_recommendations
+    _match_dishes_cached.cache_clear()
+    _match_batch_cached.cache_clear()
 
-    results: List[RecommendationOut] = []
 
-    for dish in dishes:
-        score = 0
-        reasons = []
+def _score_catalog(pref_key: PreferenceKey) -> Tuple[RecommendationOut, ...]:
+    """
+    Score normalized preferences against the set_catalog() dataset; memoized below.
+    """
+    return tuple(_score_dishes(_catalog_dishes, _catalog_normalized, _catalog_index, pref_key, _catalog_defaults))
 
-        # Normalize dish fields
-        dish_taste = normalize_token(dish.taste)
-        dish_ingredients = [normalize_token(i) for i in dish.ingredients]
-        dish_cooking = normalize_token(dish.cooking_method)
-        dish_tags = [normalize_token(t) for t in dish.dietary_tags]
-        dish_occasions = [normalize_token(o) for o in (dish.occasions or [])]
 
-        # Taste match
-        if pref_taste:
-            if pref_taste == dish_taste:
-                score += 3
-                reasons.append(f"Matches taste: {dish.taste} (+3)")
+# /match and /match_batch memoize separately, so a large batch of distinct
+# preference sets cannot evict the entries single /match calls rely on
+_match_dishes_cached = functools.lru_cache(maxsize=512)(_score_catalog)
+_match_batch_cached = functools.lru_cache(maxsize=512)(_score_catalog)
 
-        # Ingredient preference match (any)
-        ingredient_matches = set(pref_ingredients).intersection(set(dish_ingredients))
-        if ingredient_matches:
-            score += 3
-            matches_str = ", ".join(sorted(ingredient_matches))
-            reasons.append(f"Contains preferred ingredient(s): {matches_str} (+3)")
 
-        # Dietary restrictions: penalize strongly if dish contains restricted ingredient or tag
-        for rt in restriction_tokens:
-            if not rt:
-                continue
-            # If restriction token matches any ingredient or dietary tag -> penalty
-            if rt in dish_ingredients or rt in dish_tags:
-                score -= 5
-                reasons.append(f"Contains restricted item: {rt} (-5)")
-
-        # Cooking method match
-        if pref_cooking:
-            if pref_cooking == dish_cooking:
-                score += 2
-                reasons.append(f"Cooking method matches: {dish.cooking_method} (+2)")
-
-        # Occasion fit
-        if pref_occasion:
-            if pref_occasion in dish_occasions:
-                score += 1
-                reasons.append(f"Suitable for: {prefs.occasion} (+1)")
-
-        # Fallback small reason if nothing matched positively
-        if not reasons:
-            reasons.append("No strong positive matches; showing as lower-scoring suggestion")
-
-        # Build reason text (prioritize descriptive explanation)
-        reason_text = "; ".join(reasons)
-
-        results.append(RecommendationOut(
-            id=dish.id,
-            name=dish.name,
-            image=dish.image,
-            reason=reason_text,
-            score=score
-        ))
+def match_dishes_cached(prefs: PreferenceIn, top_n: int = 3) -> List[RecommendationOut]:
+    """
+    match_dishes against the set_catalog() dataset, memoized on the normalized
+    preferences. The dataset is immutable after startup, so results are stable.
+    """
+    return list(_match_dishes_cached(preference_key(prefs, top_n)))
 
-    # Sort by score desc, then by name (stable deterministic)
-    results.sort(key=lambda r: (r.score, r.name), reverse=True)
 
-    # Return top_n recommendations
-    top_results = results[:top_n]
-    logger.info("Top %d recommendations computed", len(top_results))
-    return top_results
+def match_dishes_batch(prefs_list: List[PreferenceIn], top_n: int = 3) -> List[List[RecommendationOut]]:
+    """
+    match_dishes_cached for several preference sets at once, in input order.
+    Identical preference sets in the batch are scored once; results go to a
+    cache of their own, not the one /match uses.
+    """
+    keys = [preference_key(prefs, top_n) for prefs in prefs_list]
+    scored = {key: _match_batch_cached(key) for key in dict.fromkeys(keys)}
+    return [list(scored[key]) for key in keys]
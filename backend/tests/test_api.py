@@ -0,0 +1,46 @@
+"""
+Endpoint checks for /match_batch against the dataset loaded at startup.
+"""
+import pytest
+from fastapi.testclient import TestClient
+
+from main import app
+from models.dish import MAX_BATCH_SIZE
+
+
+@pytest.fixture
+def client():
+    # Entering the client runs the startup handler, which loads dishes.json
+    with TestClient(app) as c:
+        yield c
+
+
+def test_match_batch_returns_results_in_input_order(client):
+    batch = [{"preferred_taste": "salty"}, {"preferred_taste": "sour"}, {"dietary_restrictions": ["no pork"]}]
+    response = client.post("/match_batch", json={"preferences": batch})
+    assert response.status_code == 200
+    expected = [client.post("/match", json=prefs).json() for prefs in batch]
+    assert response.json()["results"] == expected
+
+
+def test_match_batch_duplicates_get_identical_results(client):
+    prefs = {"preferred_taste": "salty", "ingredients_preference": ["pork"]}
+    response = client.post("/match_batch", json={"preferences": [prefs, {"occasion": "merienda"}, prefs]})
+    results = response.json()["results"]
+    assert results[0] == results[2]
+
+
+@pytest.mark.parametrize("size", [0, MAX_BATCH_SIZE + 1])
+def test_match_batch_rejects_batch_size(client, size):
+    response = client.post("/match_batch", json={"preferences": [{}] * size})
+    assert response.status_code == 422
+
+
+def test_match_batch_requires_preferences(client):
+    assert client.post("/match_batch", json={}).status_code == 422
+
+
+def test_match_batch_accepts_max_batch_size(client):
+    response = client.post("/match_batch", json={"preferences": [{}] * MAX_BATCH_SIZE})
+    assert response.status_code == 200
+    assert len(response.json()["results"]) == MAX_BATCH_SIZE
@@ -0,0 +1,228 @@
+"""
+Checks the bitset matcher against a plain per-dish reference scorer, and the
+memoized paths against the plain matcher.
+"""
+import random
+
+import pytest
+
+from models.dish import Dish, DishRec, PreferenceIn
+from services import matcher
+from services.matcher import (
+    build_index, match_dishes, match_dishes_batch, match_dishes_cached, normalize_dish, normalize_token,
+    parse_restriction_token, set_catalog,
+)
+
+TASTES = ["salty", "sweet", "spicy", "sour", "bitter"]
+COOKING = ["grilled", "fried", "boiled", "fermented", "steamed"]
+INGREDIENTS = ["pork", "garlic", "shrimp", "bagoong", "eggplant", "rice", "vinegar", "ampalaya"]
+TAGS = ["pork", "seafood", "vegetarian", "spicy"]
+OCCASIONS = ["everyday", "celebration", "merienda"]
+# Few names, so random catalogs are full of ties on name
+NAMES = ["Pinakbet", "Bagnet", "Dinengdeng", "Igado", "Poqui-poqui"]
+
+
+def reference_match(dishes, prefs, top_n=3):
+    """
+    Score every dish one by one with the original rules; returns (id, score, reason).
+    """
+    pref_taste = normalize_token(prefs.preferred_taste or "")
+    pref_ingredients = {normalize_token(i) for i in prefs.ingredients_preference} - {""}
+    restrictions = sorted(rt for rt in (parse_restriction_token(r) for r in prefs.dietary_restrictions if r) if rt)
+    pref_cooking = normalize_token(prefs.cooking_method or "")
+    pref_occasion = normalize_token(prefs.occasion or "")
+
+    scored = []
+    for dish in dishes:
+        ingredients = {normalize_token(i) for i in dish.ingredients}
+        tags = {normalize_token(t) for t in dish.dietary_tags}
+        score = 0
+        reasons = []
+        if pref_taste and pref_taste == normalize_token(dish.taste):
+            score += 3
+            reasons.append(f"Matches taste: {dish.taste} (+3)")
+        hits = sorted(ingredients & pref_ingredients)
+        if hits:
+            score += 3
+            reasons.append(f"Contains preferred ingredient(s): {', '.join(hits)} (+3)")
+        for rt in restrictions:
+            if rt in ingredients or rt in tags:
+                score -= 5
+                reasons.append(f"Contains restricted item: {rt} (-5)")
+        if pref_cooking and pref_cooking == normalize_token(dish.cooking_method):
+            score += 2
+            reasons.append(f"Cooking method matches: {dish.cooking_method} (+2)")
+        if pref_occasion and pref_occasion in {normalize_token(o) for o in dish.occasions}:
+            score += 1
+            reasons.append(f"Suitable for: {prefs.occasion} (+1)")
+        if not reasons:
+            reasons.append("No strong positive matches; showing as lower-scoring suggestion")
+        scored.append((score, dish.name, dish.id, "; ".join(reasons)))
+
+    # Stable sort: equal score and name keep dataset order
+    scored.sort(key=lambda s: (s[0], s[1]), reverse=True)
+    return [(dish_id, score, reason) for score, _, dish_id, reason in scored[:top_n]]
+
+
+def run_match(dishes, prefs, top_n=3):
+    normalized = [normalize_dish(d) for d in dishes]
+    index = build_index(dishes, normalized)
+    return [(r.id, r.score, r.reason) for r in match_dishes(dishes, normalized, index, prefs, top_n=top_n)]
+
+
+def make_dish(rng, dish_id, name=None):
+    return DishRec.from_dish(Dish(
+        id=dish_id,
+        name=name or rng.choice(NAMES),
+        ingredients=rng.sample(INGREDIENTS, rng.randint(0, 4)),
+        taste=rng.choice(TASTES),
+        cooking_method=rng.choice(COOKING),
+        dietary_tags=rng.sample(TAGS, rng.randint(0, 2)),
+        occasions=rng.sample(OCCASIONS, rng.randint(0, 2)),
+    ))
+
+
+def make_prefs(rng):
+    return PreferenceIn(
+        preferred_taste=rng.choice(TASTES + [None, ""]),
+        ingredients_preference=rng.sample(INGREDIENTS + ["", "durian"], rng.randint(0, 3)),
+        # Choices with replacement, so duplicate restrictions come up too
+        dietary_restrictions=rng.choices(["no pork", "no-seafood", "shrimp", "", "no beef"], k=rng.randint(0, 3)),
+        cooking_method=rng.choice(COOKING + [None]),
+        occasion=rng.choice(OCCASIONS + [None]),
+    )
+
+
+def test_matches_reference_on_random_catalogs():
+    rng = random.Random(1234)
+    for size in (0, 1, 2, 5, 17, 64, 300):
+        dishes = [make_dish(rng, i) for i in range(size)]
+        for _ in range(40):
+            prefs = make_prefs(rng)
+            top_n = rng.choice([1, 3, 10, size + 5])
+            assert run_match(dishes, prefs, top_n) == reference_match(dishes, prefs, top_n)
+
+
+def test_equal_names_keep_dataset_order():
+    rng = random.Random(7)
+    dishes = [make_dish(rng, i, name="Pinakbet") for i in range(12)]
+    prefs = PreferenceIn(preferred_taste="salty", cooking_method="boiled")
+    expected = reference_match(dishes, prefs, top_n=12)
+    assert run_match(dishes, prefs, top_n=12) == expected
+    for score in {s for _, s, _ in expected}:
+        ids = [dish_id for dish_id, s, _ in expected if s == score]
+        assert ids == sorted(ids)
+
+
+def test_empty_catalog():
+    assert run_match([], PreferenceIn()) == []
+    assert run_match([], PreferenceIn(preferred_taste="sour", dietary_restrictions=["no pork"]), top_n=5) == []
+
+
+def test_all_miss_preferences():
+    rng = random.Random(99)
+    dishes = [make_dish(rng, i) for i in range(30)]
+    prefs = PreferenceIn(preferred_taste="umami", ingredients_preference=["durian"],
+                         dietary_restrictions=["no beef"], cooking_method="raw", occasion="funeral")
+    result = run_match(dishes, prefs, top_n=30)
+    assert result == reference_match(dishes, prefs, top_n=30)
+    assert {score for _, score, _ in result} == {0}
+
+
+def test_top_n_larger_than_catalog():
+    rng = random.Random(5)
+    dishes = [make_dish(rng, i) for i in range(4)]
+    for prefs in (PreferenceIn(), PreferenceIn(preferred_taste="spicy", dietary_restrictions=["no pork"])):
+        result = run_match(dishes, prefs, top_n=10)
+        assert len(result) == 4
+        assert result == reference_match(dishes, prefs, top_n=10)
+
+
+def test_repeated_restrictions_are_each_penalized():
+    dishes = [DishRec.from_dish(Dish(id=1, name="Bagnet", ingredients=["pork", "salt"], taste="salty",
+                                     cooking_method="fried", dietary_tags=["pork"]))]
+    prefs = PreferenceIn(dietary_restrictions=["no pork", "no-pork"])
+    expected = [(1, -10, "Contains restricted item: pork (-5); Contains restricted item: pork (-5)")]
+    assert run_match(dishes, prefs) == expected
+    assert reference_match(dishes, prefs) == expected
+
+
+@pytest.fixture
+def catalog():
+    """
+    Install a random catalog with set_catalog() for the memoized paths; emptied afterwards.
+    """
+    rng = random.Random(42)
+    dishes = [make_dish(rng, i) for i in range(50)]
+    normalized = [normalize_dish(d) for d in dishes]
+    index = build_index(dishes, normalized)
+    defaults = match_dishes(dishes, normalized, index, PreferenceIn(), top_n=len(dishes))
+    set_catalog(dishes, normalized, index, defaults)
+    yield dishes, normalized, index
+    set_catalog([], [], build_index([], []), [])
+
+
+def test_cached_matches_uncached(catalog):
+    dishes, normalized, index = catalog
+    rng = random.Random(3)
+    for _ in range(50):
+        prefs = make_prefs(rng)
+        top_n = rng.choice([1, 3, 60])
+        expected = match_dishes(dishes, normalized, index, prefs, top_n=top_n)
+        assert match_dishes_cached(prefs, top_n) == expected
+        # Second call is served from the cache and must not be affected by the first caller
+        assert match_dishes_cached(prefs, top_n) == expected
+
+
+def test_cached_key_ignores_list_order(catalog):
+    first = PreferenceIn(ingredients_preference=["pork", "garlic"], dietary_restrictions=["no seafood", "shrimp"])
+    second = PreferenceIn(ingredients_preference=["garlic", "pork"], dietary_restrictions=["shrimp", "no seafood"])
+    result = match_dishes_cached(first)
+    hits = matcher._match_dishes_cached.cache_info().hits
+    assert match_dishes_cached(second) == result
+    assert matcher._match_dishes_cached.cache_info().hits == hits + 1
+
+
+def test_set_catalog_replaces_cached_results(catalog):
+    prefs = PreferenceIn(preferred_taste="salty")
+    assert match_dishes_cached(prefs)
+    set_catalog([], [], build_index([], []), [])
+    assert match_dishes_cached(prefs) == []
+
+
+def test_batch_keeps_input_order(catalog):
+    dishes, normalized, index = catalog
+    rng = random.Random(11)
+    batch = [make_prefs(rng) for _ in range(20)]
+    expected = [match_dishes(dishes, normalized, index, prefs, top_n=5) for prefs in batch]
+    assert match_dishes_batch(batch, top_n=5) == expected
+
+
+def test_batch_scores_duplicate_keys_once(catalog):
+    salty = PreferenceIn(preferred_taste="salty", ingredients_preference=["pork", "garlic"])
+    same_key = PreferenceIn(preferred_taste="Salty", ingredients_preference=["garlic", "pork"])
+    sour = PreferenceIn(preferred_taste="sour")
+    misses = matcher._match_batch_cached.cache_info().misses
+    results = match_dishes_batch([salty, sour, same_key, salty])
+    assert results[0] == results[2] == results[3]
+    assert results[1] == match_dishes_cached(sour)
+    assert matcher._match_batch_cached.cache_info().misses == misses + 2
+
+
+def test_batch_leaves_match_cache_alone(catalog):
+    rng = random.Random(5)
+    size = matcher._match_dishes_cached.cache_info().currsize
+    match_dishes_batch([make_prefs(rng) for _ in range(30)])
+    assert matcher._match_dishes_cached.cache_info().currsize == size
+
+
+def test_set_catalog_clears_both_caches(catalog):
+    dishes, normalized, index = catalog
+    prefs = PreferenceIn(preferred_taste="salty")
+    match_dishes_cached(prefs)
+    match_dishes_batch([prefs])
+    assert matcher._match_dishes_cached.cache_info().currsize
+    assert matcher._match_batch_cached.cache_info().currsize
+    set_catalog(dishes, normalized, index, [])
+    assert matcher._match_dishes_cached.cache_info().currsize == 0
+    assert matcher._match_batch_cached.cache_info().currsize == 0